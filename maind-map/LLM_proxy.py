@@ -1,195 +1,367 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-import requests
+from quart import Quart, request, Response
+from quart_cors import cors
+import orjson
+import httpx
+from cachetools import TTLCache, cached
+from dataclasses import dataclass
+from typing import Callable
+import asyncio
+import functools
+import gzip
+import hashlib
 import os
+import pathlib
+import re
+import socket
+import threading
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
+app = Quart(__name__)
+# No allow_credentials here: quart-cors refuses the wildcard-origin plus
+# credentials combination (it 500s every request), and the frontend's fetch
+# calls don't send credentials anyway
+app = cors(app, allow_origin='*')
 
-# Get Claude API key from .private file
-def get_claude_api_key_from_file():
-    try:
-        # Print current working directory
-        cwd = os.getcwd()
-        print(f"Current working directory: {cwd}")
-        
-        # List files in current directory
-        files = os.listdir('.')
-        print(f"Files in current directory: {files}")
-        
-        # Check if .private exists
-        if '.private' in files:
-            print(".private file exists in current directory")
-        else:
-            print(".private file NOT found in current directory")
-            
-        # Try to open the file
-        with open('.private', 'r') as file:
-            api_key = file.read().strip()
-            # Print first 10 characters of the API key for verification
-            print(f"API key from .private file (first 10 chars): {api_key[:10]}...")
-            print(f"API key length: {len(api_key)}")
-            return api_key
-    except Exception as e:
-        print(f"Error reading API key from .private file: {e}")
-        return os.environ.get('CLAUDE_API_KEY', 'YOUR_API_KEY')
+# Cache DNS lookups: getaddrinfo is a blocking syscall that stalls the event
+# loop's resolver threads whenever the connection pool opens a new socket to
+# api.anthropic.com / api.openai.com. A short TTL still picks up upstream IP
+# changes. Installed before any client is created. The lock is required:
+# asyncio runs getaddrinfo on executor threads, so concurrent connection
+# opens hit this cache from several threads at once, and cachetools caches
+# are not thread-safe on their own.
+_dns_cache = TTLCache(maxsize=16, ttl=300)
+_system_getaddrinfo = socket.getaddrinfo
+
+@cached(_dns_cache, lock=threading.Lock())
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    return _system_getaddrinfo(host, port, family, type, proto, flags)
+
+socket.getaddrinfo = _cached_getaddrinfo
 
-# Get OpenAI API key from environment variable or .openai_key file
-def get_openai_api_key():
+# Read an API key from a file, falling back to an environment variable.
+# The lru_cache means each key touches the filesystem exactly once per process.
+@functools.lru_cache(maxsize=None)
+def load_api_key(path, env_var, default):
     try:
-        # First check if there's a .openai_key file
-        if os.path.exists('.openai_key'):
-            with open('.openai_key', 'r') as file:
-                api_key = file.read().strip()
-                print(f"OpenAI API key from .openai_key file (first 10 chars): {api_key[:10]}...")
-                print(f"OpenAI API key length: {len(api_key)}")
-                return api_key
-        # Otherwise check environment variable
-        else:
-            api_key = os.environ.get('OPENAI_API_KEY')
-            if api_key:
-                print(f"OpenAI API key from environment variable (first 10 chars): {api_key[:10]}...")
-                return api_key
-            else:
-                print("No OpenAI API key found in environment variable or .openai_key file")
-                return 'YOUR_OPENAI_API_KEY'
-    except Exception as e:
-        print(f"Error reading OpenAI API key: {e}")
-        return os.environ.get('OPENAI_API_KEY', 'YOUR_OPENAI_API_KEY')
+        return pathlib.Path(path).read_text().strip()
+    except OSError:
+        return os.environ.get(env_var, default)
 
-CLAUDE_API_KEY = get_claude_api_key_from_file()
-OPENAI_API_KEY = get_openai_api_key()
+CLAUDE_API_KEY = load_api_key('.private', 'CLAUDE_API_KEY', 'YOUR_API_KEY')
+OPENAI_API_KEY = load_api_key('.openai_key', 'OPENAI_API_KEY', 'YOUR_OPENAI_API_KEY')
 print(f"Final Claude API key being used (first 10 chars): {CLAUDE_API_KEY[:10]}...")
 print(f"Final OpenAI API key being used (first 10 chars): {OPENAI_API_KEY[:10] if OPENAI_API_KEY else 'None'}...")
 
+# Build an async client with connection pooling so repeated calls to the same
+# API host reuse one TLS connection, and hundreds of in-flight LLM calls can
+# share the event loop instead of each blocking a worker. Both Anthropic and
+# OpenAI terminate HTTP/2, so concurrent calls multiplex as streams over one
+# TLS session instead of paying a handshake and TCP slow-start per socket.
+def make_llm_client(static_headers):
+    return httpx.AsyncClient(
+        # Explicit connect/read deadlines so a hung upstream can never pin a
+        # request forever
+        timeout=httpx.Timeout(60.0, connect=3.05),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        # http2 goes on the transport: the client-level flag is ignored when
+        # an explicit transport is supplied
+        transport=httpx.AsyncHTTPTransport(http2=True, retries=2),
+        # Static headers are set once here so each request only carries the payload
+        headers=static_headers
+    )
+
+claude_client = make_llm_client({
+    'Content-Type': 'application/json',
+    'x-api-key': CLAUDE_API_KEY,
+    'anthropic-version': '2023-06-01',
+    'anthropic-beta': 'prompt-caching-2024-07-31'
+})
+openai_client = make_llm_client({
+    'Content-Type': 'application/json',
+    'Authorization': f'Bearer {OPENAI_API_KEY}'
+})
+
+# Cap concurrent upstream calls per process so a slow upstream degrades into
+# prompt 503s instead of an unbounded queue of waiting requests
+MAX_INFLIGHT_LLM_CALLS = 50
+SLOT_ACQUIRE_TIMEOUT = 1.0
+upstream_slots = asyncio.Semaphore(MAX_INFLIGHT_LLM_CALLS)
+
+# Exact-match response cache: a repeated (model, question, mind map) triple is
+# answered from memory in microseconds instead of a multi-second LLM round-trip
+response_cache = TTLCache(maxsize=1024, ttl=3600)
+
+def response_cache_key(model, question, freemind_xml):
+    return hashlib.blake2b(f"{model}|{question}|{freemind_xml}".encode()).hexdigest()
+
+# Only gzip request bodies big enough for the size win to outweigh the
+# per-request compression setup
+MIN_GZIP_BYTES = 4096
+
+# Limits for the pre-filter that rejects bad requests before they cost us an
+# upstream round-trip and tokens
+MIN_QUESTION_CHARS = 3
+MAX_XML_CHARS = 2 * 1024 * 1024  # far larger than any real mind map
+FREEMIND_XML_RE = re.compile(r'<map[\s>]')
+
+# Fixed instruction sent with every question, kept as a constant so the same
+# prefix reaches the LLM byte-for-byte on every request
+FREEMIND_PREAMBLE = "Using the mind map represented by the following Freemind XML, please answer the following question: "
+
+# Wrap a text chunk in a Server-Sent Events frame for the frontend
+def sse_frame(text):
+    return f"data: {orjson.dumps({'text': text}).decode()}\n\n"
+
+# orjson replacement for jsonify, which is slow on large payloads
+def json_response(payload, status=200):
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
+
+# Payload skeletons built once at import; per request only the variable
+# fields are spliced in before serializing, avoiding dozens of short-lived
+# dict/str allocations per call. Mutating the shared dicts is safe on the
+# event loop because nothing awaits between the splice and orjson.dumps.
+#
+# The Claude prompt is sent as content blocks with the stable parts first:
+# the preamble and mind-map XML are marked cacheable so Anthropic's prompt
+# cache reuses them across a session at a fraction of the token cost, and
+# only the question is fresh input each time.
+_CLAUDE_PAYLOAD = {
+    'model': 'claude-3-haiku-20240307',
+    'max_tokens': 4000,
+    'stream': False,
+    'messages': [
+        {
+            'role': 'user',
+            'content': [
+                {'type': 'text', 'text': FREEMIND_PREAMBLE,
+                 'cache_control': {'type': 'ephemeral'}},
+                {'type': 'text', 'text': None,
+                 'cache_control': {'type': 'ephemeral'}},
+                {'type': 'text', 'text': None}
+            ]
+        }
+    ]
+}
+_CLAUDE_XML_BLOCK = _CLAUDE_PAYLOAD['messages'][0]['content'][1]
+_CLAUDE_QUESTION_BLOCK = _CLAUDE_PAYLOAD['messages'][0]['content'][2]
+
+_OPENAI_PAYLOAD = {
+    'model': 'gpt-3.5-turbo',  # You can change this to gpt-4 or other models
+    'max_tokens': 4000,
+    'stream': False,
+    'messages': [
+        {
+            'role': 'user',
+            'content': None
+        }
+    ]
+}
+_OPENAI_MESSAGE = _OPENAI_PAYLOAD['messages'][0]
+
+def build_claude_body(question, freemind_xml, stream):
+    _CLAUDE_XML_BLOCK['text'] = freemind_xml
+    _CLAUDE_QUESTION_BLOCK['text'] = question
+    _CLAUDE_PAYLOAD['stream'] = stream
+    return orjson.dumps(_CLAUDE_PAYLOAD)
+
+def build_openai_body(question, freemind_xml, stream):
+    # Stable prefix first so OpenAI's automatic prompt caching can reuse it.
+    # join() assembles the message with one allocation and copy, rather than
+    # the f-string's incremental formatting over the (large) XML.
+    _OPENAI_MESSAGE['content'] = ''.join((FREEMIND_PREAMBLE, freemind_xml, '\n\n', question))
+    _OPENAI_PAYLOAD['stream'] = stream
+    return orjson.dumps(_OPENAI_PAYLOAD)
+
+
+# Everything provider-specific about an LLM endpoint: where to send the
+# request, how to build the serialized request body, and how to pull text
+# out of the buffered and streamed response shapes
+@dataclass(frozen=True)
+class ProviderSpec:
+    name: str
+    url: str
+    model: str
+    client: httpx.AsyncClient
+    build_body: Callable
+    extract: Callable
+    stream_delta: Callable
+
+PROVIDERS = {
+    'claude': ProviderSpec(
+        name='Claude',
+        url='https://api.anthropic.com/v1/messages',
+        model='claude-3-haiku-20240307',
+        client=claude_client,
+        build_body=build_claude_body,
+        extract=lambda r: r['content'][0]['text'],
+        stream_delta=lambda event: event['delta'].get('text', '')
+        if event.get('type') == 'content_block_delta' else ''
+    ),
+    'chatgpt': ProviderSpec(
+        name='OpenAI',
+        url='https://api.openai.com/v1/chat/completions',
+        model='gpt-3.5-turbo',
+        client=openai_client,
+        build_body=build_openai_body,
+        extract=lambda r: r['choices'][0]['message']['content'],
+        stream_delta=lambda event: event['choices'][0]['delta'].get('content') or ''
+    ),
+}
+
 
 @app.route('/api/ping', methods=['GET'])
-def ping():
-    return jsonify({
+async def ping():
+    return json_response({
         'success': True,
         'message': 'Pong!'
     })
 
 
-@app.route('/api/claude', methods=['POST'])
-def proxy_to_claude():
+@app.route('/api/<provider>', methods=['POST'])
+async def proxy_to_llm(provider):
+    # One shared handler for /api/claude and /api/chatgpt; the ProviderSpec
+    # carries everything that differs between the two upstreams
+    spec = PROVIDERS.get(provider)
+    if spec is None:
+        return json_response({
+            'success': False,
+            'error': f"Unknown provider: {provider}"
+        }, 404)
+
     try:
         # Get the request data from the frontend
-        data = request.json
-        question = data.get('question', '')
+        data = orjson.loads(await request.get_data())
+        question = data.get('question', '').strip()
         freemind_xml = data.get('freemind_xml', '')
-        
-        # Create the message to send to Claude
-        message = f"Using the mind map represented by the following Freemind XML, please answer the following question: {question}\n\n{freemind_xml}"
-        
-        # Prepare the request to Claude API
-        claude_url = "https://api.anthropic.com/v1/messages"
-        headers = {
-            'Content-Type': 'application/json',
-            'x-api-key': CLAUDE_API_KEY,
-            'anthropic-version': '2023-06-01'
-        }
-        
-        # Print API key for debugging (first 10 chars only)
-        print(f"Using Claude API key: {CLAUDE_API_KEY[:10]}...")
-        
-        payload = {
-            'model': 'claude-3-haiku-20240307',
-            'max_tokens': 4000,
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': message
-                }
-            ]
-        }
-        
-        # Print request details for debugging
-        print(f"Making request to Claude API with headers: {headers}")
-        print(f"Payload: {payload}")
-        
-        # Make the request to Claude API
-        response = requests.post(claude_url, headers=headers, json=payload)
-        
-        # Print response details for debugging
-        print(f"Claude API response status: {response.status_code}")
-        print(f"Claude API response headers: {response.headers}")
-        print(f"Claude API response text: {response.text[:500]}...")  # Print first 500 chars
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            claude_response = response.json()
-            return jsonify({
+        wants_stream = bool(data.get('stream'))
+
+        # Answer trivially-invalid requests directly instead of wasting a
+        # multi-second upstream round-trip (and tokens) on them
+        if len(question) < MIN_QUESTION_CHARS:
+            return json_response({
+                'success': False,
+                'error': 'Question is empty or too short'
+            }, 400)
+        if not freemind_xml:
+            return json_response({
+                'success': False,
+                'error': 'freemind_xml is empty'
+            }, 400)
+        if len(freemind_xml) > MAX_XML_CHARS:
+            return json_response({
+                'success': False,
+                'error': 'Mind map XML is too large'
+            }, 413)
+        if not FREEMIND_XML_RE.search(freemind_xml):
+            return json_response({
+                'success': False,
+                'error': 'freemind_xml does not look like Freemind XML'
+            }, 400)
+
+        # Return a cached answer if we've already asked this exact question
+        cache_key = response_cache_key(spec.model, question, freemind_xml)
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            if app.debug:
+                print(f"Cache hit for {spec.name} request {cache_key[:10]}...")
+            if wants_stream:
+                return Response(sse_frame(cached_response) + "data: [DONE]\n\n",
+                                mimetype='text/event-stream')
+            return json_response({
                 'success': True,
-                'response': claude_response['content'][0]['text']
+                'response': cached_response
             })
-        else:
-            error_response = {
+
+        # Serialize once here and post the raw bytes, bypassing the client's
+        # internal json encoder
+        body = spec.build_body(question, freemind_xml, wants_stream)
+
+        # Freemind XML is highly redundant (repeated tags, whitespace), so
+        # gzip large bodies before they hit the wire. Level 1: the bottleneck
+        # is the network, not CPU.
+        extra_headers = None
+        if len(body) >= MIN_GZIP_BYTES:
+            body = gzip.compress(body, compresslevel=1)
+            extra_headers = {'Content-Encoding': 'gzip'}
+
+        # Take an upstream slot; if none frees up within a second, reject
+        # immediately instead of queueing behind a slow upstream
+        try:
+            await asyncio.wait_for(upstream_slots.acquire(), timeout=SLOT_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return json_response({
                 'success': False,
-                'error': f"API error: {response.status_code}",
-                'details': response.text
-            }
-            print(f"Returning error response: {error_response}")
-            return jsonify(error_response), 500
-            
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+                'error': 'Too many in-flight LLM requests, try again shortly'
+            }, 503)
 
+        # Stream the answer back as Server-Sent Events when the client asks,
+        # so the first tokens reach the browser while the model is still
+        # generating instead of after the full response has been buffered
+        if wants_stream:
+            # The slot is held until the stream finishes; the generator's
+            # finally releases it, and any earlier exit releases it here
+            streaming = False
+            try:
+                upstream_request = spec.client.build_request('POST', spec.url, content=body,
+                                                             headers=extra_headers)
+                response = await spec.client.send(upstream_request, stream=True)
+                if response.status_code != 200:
+                    details = (await response.aread()).decode()
+                    await response.aclose()
+                    return json_response({
+                        'success': False,
+                        'error': f"API error: {response.status_code}",
+                        'details': details
+                    }, 500)
+                streaming = True
+            finally:
+                if not streaming:
+                    upstream_slots.release()
+
+            async def generate():
+                chunks = []
+                try:
+                    async for line in response.aiter_lines():
+                        if not line.startswith('data: ') or line == 'data: [DONE]':
+                            continue
+                        text = spec.stream_delta(orjson.loads(line[6:]))
+                        if text:
+                            chunks.append(text)
+                            yield sse_frame(text)
+                    # Cache the assembled answer so a repeat question is instant
+                    response_cache[cache_key] = ''.join(chunks)
+                    yield "data: [DONE]\n\n"
+                finally:
+                    await response.aclose()
+                    upstream_slots.release()
+
+            return Response(generate(), mimetype='text/event-stream')
+
+        # Print request details for debugging (skipped in production so the
+        # hot path stays free of formatting and write syscalls)
+        if app.debug:
+            print(f"Making request to {spec.name} API with headers: {spec.client.headers}")
+            print(f"Body: {body}")
+
+        # Make the request to the LLM API over the pooled client
+        try:
+            response = await spec.client.post(spec.url, content=body, headers=extra_headers)
+        finally:
+            upstream_slots.release()
 
-@app.route('/api/chatgpt', methods=['POST'])
-def proxy_to_chatgpt():
-    try:
-        # Get the request data from the frontend
-        data = request.json
-        #
-        question = data.get('question', '')
-        freemind_xml = data.get('freemind_xml', '')
-        
-        # Create the message to send to ChatGPT
-        message = f"Using the mind map represented by the following Freemind XML, please answer the following question: {question}\n\n{freemind_xml}"
-        
-        # Prepare the request to OpenAI API
-        openai_url = "https://api.openai.com/v1/chat/completions"
-        headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {OPENAI_API_KEY}'
-        }
-        
-        # Print API key for debugging (first 10 chars only)
-        print(f"Using OpenAI API key: {OPENAI_API_KEY[:10]}...")
-        
-        payload = {
-            'model': 'gpt-3.5-turbo',  # You can change this to gpt-4 or other models
-            'max_tokens': 4000,
-            'messages': [
-                {
-                    'role': 'user',
-                    'content': message
-                }
-            ]
-        }
-        
-        # Print request details for debugging
-        print(f"Making request to OpenAI API with headers: {headers}")
-        print(f"Payload: {payload}")
-        
-        # Make the request to OpenAI API
-        response = requests.post(openai_url, headers=headers, json=payload)
-        
         # Print response details for debugging
-        print(f"OpenAI API response status: {response.status_code}")
-        print(f"OpenAI API response headers: {response.headers}")
-        print(f"OpenAI API response text: {response.text[:500]}...")  # Print first 500 chars
-        
+        if app.debug:
+            print(f"{spec.name} API response status: {response.status_code}")
+            print(f"{spec.name} API response headers: {response.headers}")
+            print(f"{spec.name} API response text: {response.text[:500]}...")  # Print first 500 chars
+
         # Check if the request was successful
         if response.status_code == 200:
-            openai_response = response.json()
-            return jsonify({
+            answer = spec.extract(orjson.loads(response.content))
+            response_cache[cache_key] = answer
+            return json_response({
                 'success': True,
-                'response': openai_response['choices'][0]['message']['content']
+                'response': answer
             })
         else:
             error_response = {
@@ -197,17 +369,18 @@ def proxy_to_chatgpt():
                 'error': f"API error: {response.status_code}",
                 'details': response.text
             }
-            print(f"Returning error response: {error_response}")
-            return jsonify(error_response), 500
-            
+            if app.debug:
+                print(f"Returning error response: {error_response}")
+            return json_response(error_response, 500)
+
     except Exception as e:
-        return jsonify({
+        return json_response({
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500)
 
 
 if __name__ == '__main__':
     print("Starting LLM API proxy server on http://localhost:5001")
     print("Send POST requests to http://localhost:5001/api/claude or http://localhost:5001/api/chatgpt")
-    app.run(debug=True, host='127.0.0.1', port=5001)
\ No newline at end of file
+    app.run(debug=True, host='127.0.0.1', port=5001)